@@ -25,8 +25,12 @@
 # the discretion of STRG.AT GmbH also the competent court, in whose district
 # the # Licensee has his registered seat, an establishment or assets.
 
-from ._init import init, ConfiguredCtxModule, Context
+from ._init import (
+    init, ConfiguredCtxModule, Context, PrefetchProfile, LazyValue, Tracer,
+    DeadlineExceededException, CircuitOpenException)
 from .cli import init_cli_ctx
 
 
-__all__ = ('init', 'ConfiguredCtxModule', 'Context', 'init_cli_ctx')
+__all__ = ('init', 'ConfiguredCtxModule', 'Context', 'PrefetchProfile',
+           'LazyValue', 'Tracer', 'DeadlineExceededException',
+           'CircuitOpenException', 'init_cli_ctx')
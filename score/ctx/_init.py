@@ -25,20 +25,36 @@
 # the discretion of STRG.AT GmbH also the competent court, in whose district
 # the Licensee has his registered seat, an establishment or assets.
 
-from collections import OrderedDict
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import enum
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import types
 from weakref import WeakKeyDictionary
 
 from transaction import TransactionManager
 from transaction.interfaces import IDataManager, ISynchronizer
 from zope.interface import implementer
 
-from score.init import ConfiguredModule
+from score.init import ConfiguredModule, parse_time_interval
 
 
 DEFAULTS = {
     'member.meta': 'meta',
     'member.tx': 'tx',
+    'group_commit.window': '5ms',
+    'group_commit.size': '100',
+    'circuit_breaker.window': '1min',
+    'circuit_breaker.cooldown': '30s',
+    'prefetch.workers': '0',
+    'prefetch.threshold': '0.9',
+    'prefetch.samples': '20',
+    'trace.size': '0',
 }
 
 
@@ -55,7 +71,32 @@ def init(confdict={}):
     tx_member = conf['member.tx']
     if tx_member and tx_member.strip().lower() == 'none':
         tx_member = None
-    return ConfiguredCtxModule(meta_member, tx_member)
+    group_commit_window = parse_time_interval(conf['group_commit.window'])
+    group_commit_size = int(conf['group_commit.size'])
+    if group_commit_size < 1:
+        raise ValueError('Invalid group_commit.size "%s"' % (
+            conf['group_commit.size'],))
+    circuit_breaker_window = parse_time_interval(
+        conf['circuit_breaker.window'])
+    circuit_breaker_cooldown = parse_time_interval(
+        conf['circuit_breaker.cooldown'])
+    prefetch_workers = int(conf['prefetch.workers'])
+    prefetch_threshold = float(conf['prefetch.threshold'])
+    if not 0 < prefetch_threshold <= 1:
+        raise ValueError('Invalid prefetch.threshold "%s"' % (
+            conf['prefetch.threshold'],))
+    prefetch_samples = int(conf['prefetch.samples'])
+    trace_size = int(conf['trace.size'])
+    return ConfiguredCtxModule(
+        meta_member, tx_member,
+        group_commit_window=group_commit_window,
+        group_commit_size=group_commit_size,
+        circuit_breaker_window=circuit_breaker_window,
+        circuit_breaker_cooldown=circuit_breaker_cooldown,
+        prefetch_workers=prefetch_workers,
+        prefetch_threshold=prefetch_threshold,
+        prefetch_samples=prefetch_samples,
+        trace_size=trace_size)
 
 
 class CtxMemberRegistration:
@@ -66,13 +107,27 @@ class CtxMemberRegistration:
                  setter,
                  destructor,
                  autojoin,
-                 commit):
+                 commit,
+                 inputs=None,
+                 exporter=None,
+                 importer=None,
+                 group_committer=None,
+                 fallback=None,
+                 lazy_previous=False,
+                 prefetch=False):
         self.name = name
         self.constructor = constructor
         self.setter = setter
         self.destructor = destructor
         self.autojoin = autojoin
         self.commit = commit
+        self.inputs = inputs
+        self.exporter = exporter
+        self.importer = importer
+        self.group_committer = group_committer
+        self.fallback = fallback
+        self.lazy_previous = lazy_previous
+        self.prefetch = prefetch
 
 
 class DeadContextException(Exception):
@@ -82,6 +137,26 @@ class DeadContextException(Exception):
         super().__init__('Trying to access attribute of a destroyed Context')
 
 
+class DeadlineExceededException(Exception):
+
+    def __init__(self, ctx, member, overrun):
+        self.ctx = ctx
+        self.member = member
+        self.overrun = overrun
+        super().__init__(
+            'Deadline of Context exceeded by %.3fs while constructing '
+            'member "%s"' % (overrun, member))
+
+
+class CircuitOpenException(Exception):
+
+    def __init__(self, ctx, member):
+        self.ctx = ctx
+        self.member = member
+        super().__init__(
+            'Circuit breaker of member "%s" is open' % (member,))
+
+
 class ConfiguredCtxModule(ConfiguredModule):
     """
     This module's :class:`configuration class
@@ -90,12 +165,33 @@ class ConfiguredCtxModule(ConfiguredModule):
     as well as hooks for context construction and destruction events.
     """
 
-    def __init__(self, meta_member, tx_member):
+    def __init__(self, meta_member, tx_member, *,
+                 group_commit_window=0.005, group_commit_size=100,
+                 circuit_breaker_window=60, circuit_breaker_cooldown=30,
+                 prefetch_workers=0, prefetch_threshold=0.9,
+                 prefetch_samples=20, trace_size=0):
         super().__init__('score.ctx')
+        self.group_commit_window = group_commit_window
+        self.group_commit_size = group_commit_size
+        self.circuit_breaker_window = circuit_breaker_window
+        self.circuit_breaker_cooldown = circuit_breaker_cooldown
+        self.circuit_breakers = {}
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_threshold = prefetch_threshold
+        self.prefetch_samples = prefetch_samples
+        self.prefetch_profiles = {}
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = None
+        self._loaders = {}
+        self._constructors = {}
+        self.tracer = Tracer(trace_size) if trace_size > 0 else None
         self.registrations = OrderedDict()
         self._create_callbacks = []
         self._destroy_callbacks = []
         self._meta_objects = WeakKeyDictionary()
+        self._computed_dependents = {}
+        self._overrun_lock = threading.Lock()
+        self.deadline_overruns = Counter()
         self.meta_member = meta_member
         self.tx_member = tx_member
         if meta_member:
@@ -106,6 +202,7 @@ class ConfiguredCtxModule(ConfiguredModule):
     def _finalize(self, score):
         self.registrations['score'] = CtxMemberRegistration(
             'score', lambda ctx: score, None, None, None, None)
+        self._computed_dependents = self._collect_computed_dependents()
         members = {'_conf': self}
         for name, registration in self.registrations.items():
             members[name] = self._create_member(name, registration)
@@ -131,7 +228,14 @@ class ConfiguredCtxModule(ConfiguredModule):
                  setter=None,
                  destructor=None,
                  commit=None,
-                 autojoin=None):
+                 group_commit=None,
+                 autojoin=None,
+                 exporter=None,
+                 importer=None,
+                 circuit_breaker=None,
+                 fallback=None,
+                 lazy_previous=False,
+                 prefetch=False):
         """
         Registers a new :term:`member <context member>` on Context objects.
         This is the function to use when populating future Context objects. An
@@ -160,18 +264,135 @@ class ConfiguredCtxModule(ConfiguredModule):
         - an exception, that was caught during the lifetime of the context.
           This last value is `None`, if the Context was destroyed without
           exception.
+
+        Members that should survive a :meth:`Context.export
+        <.Context.export>` need an *exporter* and an *importer*. The exporter
+        receives the Context and the current value of the member and must
+        return something JSON-serializable. The importer receives the new
+        Context and that exported value and returns the member value to use
+        instead of invoking the constructor.
+
+        Members backed by a shared store may pass a *group_commit* callable
+        in addition to (or instead of) a *commit* callable. Commits of
+        concurrent Contexts finishing within the configured
+        ``group_commit.window`` are then collected into a single call to
+        *group_commit*, which receives a list of ``(ctx, old, new)`` tuples and
+        may return a list containing an abort callback (or `None`) for each
+        of these tuples. If the *group_commit* callable raises an exception,
+        the *commit* callable is invoked for each Context separately, if it
+        was provided.
+
+        Passing an integer as *circuit_breaker* protects the constructor
+        against failing backends: Once it raised that many exceptions within
+        the configured ``circuit_breaker.window``, further constructions fail
+        immediately with a :class:`.CircuitOpenException` for the duration of
+        ``circuit_breaker.cooldown``. After that period, a single Context is
+        allowed to probe the constructor again. The optional *fallback* is a
+        callable receiving the Context, which provides the member value while
+        the constructor is unavailable.
+
+        Assigning a value to a member, that was not constructed yet, invokes
+        the constructor to determine the previous value for the *setter*,
+        *autojoin* and *commit* callables. If these callables can do without
+        it, *lazy_previous* avoids this construction: They will receive a
+        :class:`.LazyValue` instead, which invokes the constructor only when
+        its :meth:`get <.LazyValue.get>` method is called. Members without
+        any of these callables never construct the previous value.
+
+        Passing a truthy *prefetch* allows constructing this member
+        speculatively in a separate thread, when a labeled Context is created
+        (see :class:`.Context`). This is only safe for members, whose value
+        does not depend on other members assigned by the application.
         """
         if self._finalized:
             raise Exception(
                 'Cannot register member: configuration already finalized')
-        if name == 'destroy' or not name or name[0] == '_':
+        if name in _reserved_names or not name or name[0] == '_':
             raise ValueError('Invalid name "%s"' % name)
         if name in self.registrations:
             raise ValueError('Member "%s" already registered' % (name,))
-        if not setter and (autojoin or commit):
+        if bool(exporter) != bool(importer):
+            raise ValueError(
+                'Member "%s" needs both, an exporter and an importer' %
+                (name,))
+        if fallback and not circuit_breaker:
+            raise ValueError(
+                'Member "%s" has a fallback, but no circuit breaker' % (name,))
+        if not setter and (autojoin or commit or group_commit):
             setter = True
+        if circuit_breaker:
+            self.circuit_breakers[name] = CircuitBreaker(
+                int(circuit_breaker), self.circuit_breaker_window,
+                self.circuit_breaker_cooldown)
+        group_committer = None
+        if group_commit:
+            group_committer = GroupCommitter(
+                self, name, group_commit, commit,
+                self.group_commit_window, self.group_commit_size)
         self.registrations[name] = CtxMemberRegistration(
-            name, constructor, setter, destructor, autojoin, commit)
+            name, constructor, setter, destructor, autojoin, commit,
+            exporter=exporter, importer=importer,
+            group_committer=group_committer, fallback=fallback,
+            lazy_previous=lazy_previous, prefetch=prefetch)
+
+    def register_computed(self, name, constructor, *, inputs, prefetch=False):
+        """
+        Registers a :term:`member <context member>`, whose value is derived
+        from other members. The value is computed by *constructor* the first
+        time it is accessed and cached like any other member. Whenever one of
+        the members listed in *inputs* is assigned a new value, the cached
+        value is discarded and will be computed anew on next access:
+
+        >>> def permissions(ctx):
+        ...     return load_permissions(ctx.user, ctx.tenant)
+        ...
+        >>> ctx_conf.register_computed(
+        ...     'permissions', permissions, inputs=['user', 'tenant'])
+
+        The *inputs* may contain other computed members, in which case
+        invalidation is propagated to all members depending on them.
+        Computed members cannot be assigned to. The *prefetch* flag has the
+        same meaning as in :meth:`.register`, a speculative value is discarded
+        if any member is assigned while it is being computed.
+        """
+        inputs = tuple(inputs)
+        if not inputs:
+            raise ValueError('Computed member "%s" has no inputs' % (name,))
+        self.register(name, constructor, prefetch=prefetch)
+        self.registrations[name].inputs = inputs
+
+    def _collect_computed_dependents(self):
+        direct = {}
+        for name, registration in self.registrations.items():
+            for input in registration.inputs or ():
+                if input not in self.registrations:
+                    raise ValueError(
+                        'Computed member "%s" depends on unknown member "%s"'
+                        % (name, input))
+                direct.setdefault(input, []).append(name)
+        dependents = {}
+        for name in direct:
+            collected = []
+            pending = list(direct[name])
+            while pending:
+                dependent = pending.pop(0)
+                if dependent == name:
+                    raise ValueError(
+                        'Computed member "%s" depends on itself' % (name,))
+                if dependent in collected:
+                    continue
+                collected.append(dependent)
+                pending.extend(direct.get(dependent, []))
+            dependents[name] = collected
+        return dependents
+
+    def _invalidate_dependents(self, meta, name):
+        for dependent in self._computed_dependents.get(name, ()):
+            if dependent not in meta.constructed_members:
+                continue
+            self.log.debug('Invalidating computed member %s', dependent)
+            meta.constructed_members.pop(dependent)
+            meta.persisted_values.pop(dependent, None)
 
     def on_create(self, callable):
         """
@@ -198,45 +419,239 @@ class ConfiguredCtxModule(ConfiguredModule):
                 'Cannot add destroy listener: configuration already finalized')
         self._destroy_callbacks.append(callable)
 
+    def trace(self, name, category, ctx=None):
+        """
+        Provides a :term:`context manager <python:context manager>`
+        recording the time spent in its block as an event of the
+        :attr:`tracer`. Does nothing if tracing is disabled.
+        """
+        if self.tracer is None:
+            return _null_span
+        return TraceSpan(self.tracer, name, category, ctx)
+
+    def memory_usage(self):
+        """
+        Estimates the memory retained by the members of all living Contexts.
+        Returns a `dict` mapping each Context to the return value of
+        ``ctx.meta.memory_usage()``. This operation is expensive and meant for
+        debugging purposes.
+        """
+        return dict((ctx, meta.memory_usage())
+                    for ctx, meta in list(self._meta_objects.items())
+                    if not meta.dead)
+
+    def get_prefetch_profile(self, label):
+        """
+        Provides the :class:`.PrefetchProfile` collecting the member accesses
+        of all Contexts created with given *label*.
+        """
+        with self._prefetch_lock:
+            if label not in self.prefetch_profiles:
+                self.prefetch_profiles[label] = PrefetchProfile(label)
+            return self.prefetch_profiles[label]
+
+    def _start_profiling(self, meta, label):
+        meta.profile = self.get_prefetch_profile(label)
+        meta.accessed = OrderedDict()
+
+    def _prefetch(self, ctx, meta):
+        if not self.prefetch_workers:
+            return
+        members = [
+            name for name in meta.profile.predict(
+                self.prefetch_threshold, self.prefetch_samples)
+            if self.registrations[name].prefetch and
+            name not in meta.constructed_members]
+        if not members:
+            return
+        with self._prefetch_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(
+                    self.prefetch_workers,
+                    thread_name_prefix='score.ctx.prefetch')
+        self.log.debug('Prefetching members %s', ', '.join(members))
+        meta.construction_locks = {}
+        meta.prefetched = set(members)
+        meta.prefetch_futures = [
+            self._prefetch_executor.submit(self._prefetch_member, ctx, name)
+            for name in members]
+
+    def _prefetch_member(self, ctx, name):
+        _construction.prefetching = True
+        try:
+            self._loaders[name](ctx, self.get_meta(ctx))
+        except Exception as e:
+            self.log.debug('Prefetching member %s failed: %s', name, e)
+        finally:
+            _construction.prefetching = False
+
     def _create_member(self, name, registration):
         getter = self._create_member_getter(name, registration)
         setter = self._create_member_setter(name, registration, getter)
         return property(getter, setter)
 
     def _create_member_getter(self, name, registration):
+        builtin = name in (self.meta_member, self.tx_member, 'score')
+        breaker = self.circuit_breakers.get(name)
+
+        def construct(ctx, meta):
+            if not builtin and meta.deadline is not None:
+                return self._construct_within_deadline(
+                    ctx, meta, name, registration)
+            return registration.constructor(ctx)
+
+        def load(ctx, meta):
+            if name in meta.constructed_members:
+                return
+            if not meta.active:
+                raise DeadContextException(ctx)
+            if meta.construction_locks is not None:
+                with meta.construction_lock(name):
+                    if name not in meta.constructed_members:
+                        load_unlocked(ctx, meta)
+            else:
+                load_unlocked(ctx, meta)
+
+        def construct_guarded(ctx, meta):
+            _construction.depth += 1
+            try:
+                with self.trace(name, 'constructor', ctx):
+                    if not builtin and meta.deadline is not None:
+                        self._check_deadline(ctx, meta, name)
+                    if breaker:
+                        return self._construct_with_breaker(
+                            ctx, meta, name, registration, breaker, construct)
+                    return construct(ctx, meta)
+            finally:
+                _construction.depth -= 1
+
+        def load_unlocked(ctx, meta):
+            speculative = _construction.prefetching
+            assignments = meta.assignments
+            value = construct_guarded(ctx, meta)
+            with meta.assignment_lock:
+                # the member itself may have been assigned while constructing,
+                # a speculative value may further depend on any other
+                # assignment made in the meantime
+                discard = name in meta.constructed_members or (
+                    speculative and meta.assignments != assignments)
+                if not discard:
+                    meta.constructed_members[name] = value
+                    meta.persisted_values[name] = value
+            if discard:
+                self.log.debug('Discarding member %s', name)
+                if registration.destructor:
+                    registration.destructor(ctx, value, None)
+                return
+            self.log.debug('Created member %s', name)
+
         def getter(ctx):
             meta = self.get_meta(ctx)
             if meta.dead:
                 raise DeadContextException(ctx)
+            if meta.accessed is not None and not builtin and \
+                    not _construction.depth:
+                meta.accessed[name] = True
             if name not in meta.constructed_members:
-                if not meta.active:
-                    raise DeadContextException(ctx)
-                value = registration.constructor(ctx)
-                self.log.debug('Created member %s', name)
-                meta.constructed_members[name] = value
-                meta.persisted_values[name] = value
+                load(ctx, meta)
             return meta.constructed_members[name]
         getter.__name__ = 'get_ctx_' + name
+        self._loaders[name] = load
+        self._constructors[name] = construct_guarded
         return getter
 
+    def _construct_with_breaker(self, ctx, meta, name, registration, breaker,
+                                construct):
+        if not breaker.acquire():
+            self.log.debug('Circuit breaker of member %s is open', name)
+            if registration.fallback:
+                return registration.fallback(ctx)
+            raise CircuitOpenException(ctx, name)
+        try:
+            value = construct(ctx, meta)
+        except DeadlineExceededException:
+            # the budget of a single Context says nothing about the health of
+            # the backend
+            breaker.release()
+            raise
+        except Exception:
+            if not breaker.failure():
+                raise
+            # this failure opened the breaker, so the fallback takes over
+            # starting with this very Context
+            self.log.warning('Opening circuit breaker of member %s', name)
+            if not registration.fallback:
+                raise
+            return registration.fallback(ctx)
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.success()
+        return value
+
+    def _check_deadline(self, ctx, meta, name):
+        remaining = meta.remaining
+        if remaining <= 0:
+            self._record_overrun(meta, name, -remaining)
+            raise DeadlineExceededException(ctx, name, -remaining)
+
+    def _construct_within_deadline(self, ctx, meta, name, registration):
+        value = registration.constructor(ctx)
+        remaining = meta.remaining
+        if remaining >= 0:
+            return value
+        self._record_overrun(meta, name, -remaining)
+        exception = DeadlineExceededException(ctx, name, -remaining)
+        if registration.destructor:
+            registration.destructor(ctx, value, exception)
+        raise exception
+
+    def _record_overrun(self, meta, name, overrun):
+        self.log.warning('Deadline exceeded by %.3fs constructing member %s',
+                         overrun, name)
+        meta.overruns[name] = overrun
+        with self._overrun_lock:
+            self.deadline_overruns[name] += 1
+
     def _create_member_setter(self, name, registration, getter):
         if not registration.setter:
             return None
+        needs_previous = (callable(registration.setter) or
+                          registration.autojoin or registration.commit or
+                          registration.group_committer)
+        construct = self._constructors[name]
 
         def setter(ctx, value):
             meta = self.get_meta(ctx)
             if meta.dead:
                 raise DeadContextException(ctx)
+            if meta.construction_locks is not None:
+                # wait for a prefetch of this member to finish
+                with meta.construction_lock(name):
+                    assign(ctx, meta, value)
+            else:
+                assign(ctx, meta, value)
+
+        def assign(ctx, meta, value):
             if name in meta.constructed_members:
                 previous_value = meta.constructed_members[name]
             elif not meta.active:
                 raise DeadContextException(ctx)
+            elif not needs_previous:
+                previous_value = None
+            elif registration.lazy_previous:
+                previous_value = LazyValue(ctx, meta, name, construct)
+                meta.persisted_values[name] = previous_value
             else:
                 previous_value = getter(ctx)
             if callable(registration.setter):
-                registration.setter(ctx, previous_value, value)
+                with self.trace(name, 'setter', ctx):
+                    registration.setter(ctx, previous_value, value)
             self.log.debug('Setting member %s', name)
-            meta.constructed_members[name] = value
+            with meta.assignment_lock:
+                meta.assignments += 1
+                meta.constructed_members[name] = value
+                self._invalidate_dependents(meta, name)
         setter.__name__ = 'set_ctx_' + name
         return setter
 
@@ -256,14 +671,79 @@ class Context:
     >>> with ctx_conf.Context() as ctx:
     ...     ctx.logout_user()
     ...
+
+    A Context may be given a time budget, either as a *timeout* in seconds or
+    as an absolute *deadline* timestamp as returned by :func:`time.time`.
+    Constructors can query the remaining time via the ``remaining`` attribute
+    of the Context's metadata to size their own I/O timeouts. Constructing a
+    member after the budget is exhausted raises a
+    :class:`.DeadlineExceededException`.
+
+    The optional *label* names the entry point creating this Context. The
+    members accessed by Contexts sharing a label are recorded in a
+    :class:`.PrefetchProfile` and may be constructed speculatively in future
+    Contexts with the same label.
     """
 
-    def __init__(self):
+    def __init__(self, *, deadline=None, timeout=None, label=None):
         if not hasattr(self, '_conf'):
             raise Exception('Unconfigured Context')
+        if deadline is not None and timeout is not None:
+            raise ValueError('Cannot provide both, deadline and timeout')
         self._conf.log.debug('Initializing')
-        for callback in self._conf._create_callbacks:
-            callback(self)
+        with self._conf.trace('Context.__init__', 'context', self):
+            if deadline is not None:
+                timeout = deadline - time.time()
+            if timeout is not None:
+                self._conf.get_meta(self).deadline = time.monotonic() + timeout
+            if label is not None:
+                meta = self._conf.get_meta(self)
+                self._conf._start_profiling(meta, label)
+            for callback in self._conf._create_callbacks:
+                with self._conf.trace(_callable_name(callback),
+                                      'create callback', self):
+                    callback(self)
+            if label is not None:
+                self._conf._prefetch(self, meta)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, **kwargs):
+        """
+        Creates a new Context, that is pre-populated with the member values
+        found in given *snapshot*, which must be the return value of an
+        earlier call to :meth:`.export`. The constructors of these members
+        will not be invoked, their values are provided by the importers
+        passed to :meth:`ConfiguredCtxModule.register
+        <.ConfiguredCtxModule.register>` instead. Any further keyword
+        arguments are passed to the Context constructor. If a *label* is
+        among them, prefetching starts only after the snapshot was imported.
+        """
+        if isinstance(snapshot, bytes):
+            snapshot = snapshot.decode('utf-8')
+        exported = json.loads(snapshot, object_pairs_hook=OrderedDict)
+        if not isinstance(exported, dict):
+            raise ValueError('Invalid snapshot')
+        label = kwargs.pop('label', None)
+        ctx = cls(**kwargs)
+        meta = ctx._conf.get_meta(ctx)
+        try:
+            for name, exported_value in exported.items():
+                registration = ctx._conf.registrations.get(name)
+                if not registration or not registration.importer:
+                    raise ValueError('Cannot import member "%s"' % (name,))
+                if name in meta.constructed_members:
+                    continue
+                value = registration.importer(ctx, exported_value)
+                ctx._conf.log.debug('Imported member %s', name)
+                meta.constructed_members[name] = value
+                meta.persisted_values[name] = value
+            if label is not None:
+                ctx._conf._start_profiling(meta, label)
+                ctx._conf._prefetch(ctx, meta)
+        except BaseException as e:
+            ctx.destroy(e)
+            raise
+        return ctx
 
     def __del__(self):
         meta = self._conf.get_meta(self, autocreate=False)
@@ -279,6 +759,30 @@ class Context:
     def __exit__(self, type, value, traceback):
         self.destroy(value)
 
+    def export(self, members=None):
+        """
+        Serializes the values of the given *members* into a compact snapshot,
+        which can be passed to :meth:`.from_snapshot` in another process to
+        re-create these members without invoking their constructors.
+
+        If *members* is omitted, all members that were already constructed and
+        provide an exporter will be included in the snapshot. Explicitly
+        requested members will be constructed, if necessary.
+        """
+        meta = self._conf.get_meta(self)
+        if not meta.active:
+            raise DeadContextException(self)
+        if members is None:
+            members = [name for name in meta.constructed_members
+                       if self._conf.registrations[name].exporter]
+        exported = OrderedDict()
+        for name in members:
+            registration = self._conf.registrations.get(name)
+            if not registration or not registration.exporter:
+                raise ValueError('Cannot export member "%s"' % (name,))
+            exported[name] = registration.exporter(self, getattr(self, name))
+        return json.dumps(exported, separators=(',', ':')).encode('utf-8')
+
     def destroy(self, exception=None):
         """
         Cleans up this context and makes it unusable.
@@ -297,30 +801,189 @@ class Context:
                                  type(exception).__name__, exception)
         else:
             self._conf.log.debug('Destroying')
+        if meta.prefetch_futures:
+            wait(meta.prefetch_futures)
         if self._conf.tx_member:
             transaction = self._conf.get_tx(self).get()
             if exception or transaction.isDoomed():
                 transaction.abort()
             else:
                 transaction.commit()
+        if meta.profile is not None:
+            meta.profile.record(list(meta.accessed), meta.prefetched)
         meta.state = meta.State.DESTROYING
-        for attr in reversed(list(meta.constructed_members.keys())):
-            self._conf.log.debug('Deleting member %s', attr)
-            destructor = self._conf.registrations[attr].destructor
-            if destructor:
-                self._conf.log.debug('Calling destructor of %s', attr)
-                constructor_value = meta.constructed_members[attr]
-                destructor(self, constructor_value, None)
-            meta.constructed_members.pop(attr)
-        for callback in self._conf._destroy_callbacks:
-            callback(self, exception)
-        if self._conf.tx_member:
-            transaction = self._conf.get_tx(self).get()
-            if exception or transaction.isDoomed():
-                transaction.abort()
-            else:
-                transaction.commit()
-        meta.state = meta.State.DEAD
+        try:
+            for attr in reversed(list(meta.constructed_members.keys())):
+                self._conf.log.debug('Deleting member %s', attr)
+                destructor = self._conf.registrations[attr].destructor
+                if destructor:
+                    self._conf.log.debug('Calling destructor of %s', attr)
+                    constructor_value = meta.constructed_members[attr]
+                    with self._conf.trace(attr, 'destructor', self):
+                        destructor(self, constructor_value, None)
+                meta.constructed_members.pop(attr)
+            for callback in self._conf._destroy_callbacks:
+                with self._conf.trace(_callable_name(callback),
+                                      'destroy callback', self):
+                    callback(self, exception)
+            if self._conf.tx_member:
+                transaction = self._conf.get_tx(self).get()
+                if exception or transaction.isDoomed():
+                    transaction.abort()
+                else:
+                    transaction.commit()
+        finally:
+            meta.persisted_values.clear()
+            meta.state = meta.State.DEAD
+
+
+class LazyValue:
+    """
+    Stands in for the previous value of a member, that was assigned a new value
+    before it was ever constructed. The member's constructor is invoked on the
+    first call to :meth:`.get`.
+    """
+
+    def __init__(self, ctx, meta, member, constructor):
+        self.ctx = ctx
+        self.meta = meta
+        self.member = member
+        self._constructor = constructor
+        self._constructed = False
+        self._value = None
+
+    @property
+    def constructed(self):
+        """
+        Whether the value was already constructed.
+        """
+        return self._constructed
+
+    def get(self):
+        """
+        Constructs the value, if that did not happen yet, and returns it.
+        """
+        if not self._constructed:
+            if self.meta.dead:
+                raise DeadContextException(self.ctx)
+            self._value = self._constructor(self.ctx, self.meta)
+            self._constructed = True
+            self.meta.conf.log.debug(
+                'Created previous value of member %s', self.member)
+        return self._value
+
+
+class Tracer:
+    """
+    Records timing events in a ring buffer holding the last *size* events,
+    which can be written as a `Chrome trace event`_ file.
+
+    .. _Chrome trace event: https://docs.google.com/document/d/
+        1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+    """
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.pid = os.getpid()
+
+    def record(self, name, category, ctx, start, duration):
+        self.events.append((name, category, start, duration,
+                            threading.get_ident(), id(ctx) if ctx else None))
+
+    def clear(self):
+        self.events.clear()
+
+    def to_json(self):
+        """
+        Converts the recorded events to a `dict` in Chrome's trace event
+        format, suitable for :func:`json.dump`.
+        """
+        events = []
+        for name, category, start, duration, tid, ctx in list(self.events):
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': duration * 1e6,
+                'pid': self.pid,
+                'tid': tid,
+            }
+            if ctx is not None:
+                event['args'] = {'ctx': '0x%x' % ctx}
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, file):
+        """
+        Writes the recorded events to the file object or path *file*.
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as fp:
+                json.dump(self.to_json(), fp)
+        else:
+            json.dump(self.to_json(), file)
+
+
+class TraceSpan:
+
+    __slots__ = ('tracer', 'name', 'category', 'ctx', 'start')
+
+    def __init__(self, tracer, name, category, ctx):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.ctx = ctx
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, type, value, traceback):
+        end = time.perf_counter()
+        self.tracer.record(self.name, self.category, self.ctx,
+                           self.start, end - self.start)
+
+
+class _NullSpan:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+def _callable_name(callback):
+    return getattr(callback, '__qualname__', None) or repr(callback)
+
+
+_unaccounted_types = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, types.CodeType, types.FrameType)
+
+
+def _retained_size(obj, seen):
+    """
+    Sums up the sizes of *obj* and all objects reachable from it, skipping
+    objects whose ids are in *seen*, which is updated with all visited ids.
+    """
+    size = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _unaccounted_types):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj, 0)
+        pending.extend(gc.get_referents(obj))
+    return size
+
+
+_reserved_names = [
+    name for name in Context.__dict__ if not name.startswith('_')]
 
 
 @implementer(IDataManager)
@@ -361,12 +1024,250 @@ class AutoCommitter:
     def commit(self, transaction):
         old = self.meta.persisted_values[self.member_name]
         new = self.meta.constructed_members[self.member_name]
-        self.abort_callback = self.commit_callback(self.ctx, old, new)
+        with self.meta.conf.trace(self.member_name, 'commit', self.ctx):
+            self.abort_callback = self.commit_callback(self.ctx, old, new)
 
     def tpc_vote(self, transaction):
         pass
 
 
+class CircuitBreaker:
+    """
+    Keeps track of constructor failures of a member across all contexts. The
+    breaker opens after *threshold* failures within *window* seconds and
+    rejects all constructions for *cooldown* seconds. Afterwards, it lets a
+    single probe through, which either closes the breaker again or re-opens it.
+    """
+
+    @enum.unique
+    class State(enum.IntEnum):
+        CLOSED = 0
+        OPEN = 1
+        HALF_OPEN = 2
+
+    def __init__(self, threshold, window, cooldown):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.state = self.State.CLOSED
+        self._failures = []
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.state == self.State.CLOSED:
+                return True
+            if self.state == self.State.HALF_OPEN:
+                return False
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self.state = self.State.HALF_OPEN
+            return True
+
+    def release(self):
+        with self._lock:
+            if self.state == self.State.HALF_OPEN:
+                self.state = self.State.OPEN
+
+    def success(self):
+        with self._lock:
+            self.state = self.State.CLOSED
+            self._failures = []
+
+    def failure(self):
+        """
+        Records a failure and returns whether the breaker was opened by it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.State.HALF_OPEN:
+                self.state = self.State.OPEN
+                self._opened_at = now
+                return True
+            if self.state == self.State.OPEN:
+                return False
+            self._failures = [
+                failure for failure in self._failures
+                if now - failure < self.window]
+            self._failures.append(now)
+            if len(self._failures) < self.threshold:
+                return False
+            self.state = self.State.OPEN
+            self._opened_at = now
+            self._failures = []
+            return True
+
+
+# Keeps track of the number of member constructors currently running in a
+# thread. Members accessed by other constructors are not recorded in
+# prefetch profiles, since they are constructed implicitly anyway.
+class _ConstructionState(threading.local):
+    depth = 0
+    prefetching = False
+
+
+_construction = _ConstructionState()
+
+
+class PrefetchProfile:
+    """
+    Statistics about the members accessed by all Contexts sharing a *label*.
+    The counters :attr:`hits`, :attr:`misses` and :attr:`wasted` describe
+    the quality of the speculative construction: A hit is a prefetched member
+    that was actually accessed, a miss is an accessed member that was not
+    prefetched and a wasted prefetch was never accessed.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.contexts = 0
+        self.accesses = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self._lock = threading.Lock()
+
+    def record(self, accessed, prefetched):
+        with self._lock:
+            self.contexts += 1
+            self.accesses.update(accessed)
+            if prefetched:
+                hits = len(prefetched.intersection(accessed))
+                self.hits += hits
+                self.misses += len(accessed) - hits
+                self.wasted += len(prefetched) - hits
+
+    def predict(self, threshold, samples):
+        """
+        Lists the members, that were accessed in at least *threshold* (a
+        fraction between 0 and 1) of all recorded Contexts. Returns an empty
+        list until at least *samples* Contexts were recorded.
+        """
+        with self._lock:
+            if self.contexts < max(samples, 1):
+                return []
+            minimum = threshold * self.contexts
+            return [name for name, count in self.accesses.most_common()
+                    if count >= minimum]
+
+
+class GroupCommitter:
+    """
+    Collects commits of a member across concurrent contexts and passes them
+    to a single batched callback. The first context to arrive becomes the
+    leader of a batch and performs the batched call once the window elapsed
+    or the batch is full, all others wait for their result. If the leader is
+    interrupted while collecting, a waiting context takes over.
+    """
+
+    class Entry:
+
+        def __init__(self, ctx, old, new):
+            self.ctx = ctx
+            self.old = old
+            self.new = new
+            self.batched = False
+            self.done = False
+            self.abort_callback = None
+            self.exception = None
+
+    def __init__(self, conf, member_name, batch_callback, commit_callback,
+                 window, size):
+        self.conf = conf
+        self.member_name = member_name
+        self.batch_callback = batch_callback
+        self.commit_callback = commit_callback
+        self.window = window
+        self.size = size
+        self._pending = []
+        self._leading = False
+        self._condition = threading.Condition()
+
+    def commit(self, ctx, old, new):
+        entry = self.Entry(ctx, old, new)
+        batch = None
+        with self._condition:
+            self._pending.append(entry)
+            if len(self._pending) >= self.size:
+                self._condition.notify_all()
+            while not entry.done and (self._leading or entry.batched):
+                self._condition.wait()
+            if not entry.done:
+                self._leading = True
+                try:
+                    batch = self._collect()
+                except BaseException:
+                    self._pending.remove(entry)
+                    raise
+                finally:
+                    self._leading = False
+                    self._condition.notify_all()
+        if batch is not None:
+            try:
+                self._flush(batch)
+            except BaseException as e:
+                for batch_entry in batch:
+                    if batch_entry.exception is None and \
+                            batch_entry.abort_callback is None:
+                        batch_entry.exception = e
+                raise
+            finally:
+                with self._condition:
+                    for batch_entry in batch:
+                        batch_entry.done = True
+                    self._condition.notify_all()
+        if entry.exception is not None:
+            raise entry.exception
+        return entry.abort_callback
+
+    def _collect(self):
+        deadline = time.monotonic() + self.window
+        while len(self._pending) < self.size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+        batch, self._pending = self._pending, []
+        for entry in batch:
+            entry.batched = True
+        return batch
+
+    def _flush(self, batch):
+        self.conf.log.debug('Committing %d values of member %s',
+                            len(batch), self.member_name)
+        try:
+            results = self.batch_callback(
+                [(entry.ctx, entry.old, entry.new) for entry in batch])
+        except Exception as e:
+            if not self.commit_callback:
+                for entry in batch:
+                    entry.exception = e
+                return
+            self.conf.log.debug(
+                'Batched commit of member %s failed, committing separately',
+                self.member_name)
+            for entry in batch:
+                try:
+                    entry.abort_callback = self.commit_callback(
+                        entry.ctx, entry.old, entry.new)
+                except Exception as e:
+                    entry.exception = e
+            return
+        if results is None:
+            return
+        results = list(results)
+        if len(results) != len(batch):
+            exception = ValueError(
+                'Batched commit of member "%s" returned %d abort callbacks '
+                'for %d values' % (self.member_name, len(results), len(batch)))
+            for entry in batch:
+                entry.exception = exception
+            return
+        for entry, abort_callback in zip(batch, results):
+            entry.abort_callback = abort_callback
+
+
 @implementer(ISynchronizer)
 class TransactionSynchronizer:
 
@@ -379,10 +1280,24 @@ class TransactionSynchronizer:
         pass
 
     def beforeCompletion(self, transaction):
+        if transaction.status == 'Commit failed':
+            # aborting a failed commit, nothing may join anymore
+            return
+        if self.meta.prefetch_futures:
+            wait(self.meta.prefetch_futures)
+        with self.conf.trace('beforeCompletion', 'transaction', self.ctx):
+            self._join_members(transaction)
+
+    def _join_members(self, transaction):
         sort_key = len(self.meta.constructed_members)
-        for name, current_value in self.meta.constructed_members.items():
+        for name, current_value in list(
+                self.meta.constructed_members.items()):
             registration = self.conf.registrations[name]
-            if not registration.autojoin and not registration.commit:
+            if registration.group_committer:
+                commit_callback = registration.group_committer.commit
+            else:
+                commit_callback = registration.commit
+            if not registration.autojoin and not commit_callback:
                 continue
             persisted_value = self.meta.persisted_values[name]
             # if persisted_value == current_value:
@@ -390,13 +1305,22 @@ class TransactionSynchronizer:
             if registration.autojoin:
                 transaction.join(registration.autojoin(
                     self.ctx, persisted_value, current_value))
-            if registration.commit:
+            if commit_callback:
                 sort_key -= 1
                 transaction.join(AutoCommitter(
-                    self.meta, name, registration.commit, sort_key))
+                    self.meta, name, commit_callback, sort_key))
 
     def afterCompletion(self, transaction):
-        pass
+        if transaction.status != 'Committed':
+            return
+        # the committed values are the new baseline, previous snapshots are
+        # not needed anymore
+        persisted_values = self.meta.persisted_values
+        for name in list(persisted_values):
+            if name in self.meta.constructed_members:
+                persisted_values[name] = self.meta.constructed_members[name]
+            else:
+                persisted_values.pop(name)
 
 
 class ContextMetadata:
@@ -407,6 +1331,18 @@ class ContextMetadata:
 
     _registered_members = None
 
+    deadline = None
+
+    profile = None
+
+    accessed = None
+
+    prefetched = None
+
+    prefetch_futures = None
+
+    construction_locks = None
+
     @enum.unique
     class State(enum.IntEnum):
         DEAD = 0
@@ -420,6 +1356,10 @@ class ContextMetadata:
         self.destoying = False
         self.constructed_members = OrderedDict()
         self.persisted_values = {}
+        self.overruns = {}
+        self._construction_locks_lock = threading.Lock()
+        self.assignment_lock = threading.Lock()
+        self.assignments = 0
 
     @property
     def tx(self):
@@ -429,6 +1369,22 @@ class ContextMetadata:
             self._tx.registerSynch(self._tx_synchronizer)
         return self._tx
 
+    def construction_lock(self, name):
+        with self._construction_locks_lock:
+            if name not in self.construction_locks:
+                self.construction_locks[name] = threading.RLock()
+            return self.construction_locks[name]
+
+    @property
+    def remaining(self):
+        """
+        Seconds left until the deadline of the Context, or `None` if the
+        Context has no time budget. Negative once the deadline has passed.
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
     @property
     def active(self):
         return self.state == self.State.ACTIVE
@@ -447,6 +1403,26 @@ class ContextMetadata:
             self._registered_members = list(self.conf.registrations.keys())
         return self._registered_members
 
+    def memory_usage(self):
+        """
+        Estimates the number of bytes retained by each constructed member of
+        the Context, including its persisted snapshot. Objects reachable
+        from multiple members are accounted to the first of them, the score
+        application and the Context itself are not accounted at all. The
+        returned `dict` contains an additional key `None` holding the total.
+        """
+        seen = set(map(id, (self.ctx, self, self.conf)))
+        if 'score' in self.constructed_members:
+            seen.add(id(self.constructed_members['score']))
+        usage = OrderedDict()
+        for name, value in list(self.constructed_members.items()):
+            usage[name] = _retained_size(value, seen)
+            if name in self.persisted_values:
+                persisted_value = self.persisted_values[name]
+                usage[name] += _retained_size(persisted_value, seen)
+        usage[None] = sum(usage.values())
+        return usage
+
     def member_exists(self, name):
         return name in self.registered_members
 
@@ -25,18 +25,35 @@
 # the # Licensee has his registered seat, an establishment or assets.
 
 import functools
+import os
 
 
 def init_cli_ctx(command):
     """
     Decorator for click commands that provides a Context object.
+
+    If the environment variable ``SCORE_CTX_SOCKET`` points to the socket of a
+    running ``score ctx serve`` process, the command will be executed by that
+    process instead, which avoids initializing score for every invocation. The
+    command falls back to local execution, if the daemon is unreachable.
     """
 
+    import click
     from score.cli import init_score
+    from . import daemon
 
-    @functools.wraps(command)
     @init_score
-    def wrapped(score, *args, **kwargs):
+    def run(score, *args, **kwargs):
         with score.ctx.Context() as ctx:
             return command(ctx, *args, **kwargs)
+
+    @functools.wraps(command)
+    @click.pass_context
+    def wrapped(clickctx, *args, **kwargs):
+        socket_path = os.environ.get(daemon.SOCKET_ENV)
+        if socket_path and not daemon.serving:
+            exit_code = daemon.invoke_remote(socket_path, clickctx)
+            if exit_code is not None:
+                clickctx.exit(exit_code)
+        return run(*args, **kwargs)
     return wrapped
@@ -0,0 +1,315 @@
+# Copyright © 2019-2020 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the # Licensee has his registered seat, an establishment or assets.
+
+"""
+Keeps an initialized score application resident and executes commands
+decorated with :func:`score.ctx.init_cli_ctx` on behalf of short-lived client
+processes, which connect through a local Unix socket.
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import traceback
+
+import click
+
+
+SOCKET_ENV = 'SCORE_CTX_SOCKET'
+
+log = logging.getLogger('score.ctx.daemon')
+
+# Set while the daemon is executing a command, to prevent the command from
+# forwarding itself to the daemon again.
+serving = False
+
+
+def command_path(clickctx):
+    """
+    Provides the names of the sub-commands leading to the command of given
+    click context, without the name of the root command.
+    """
+    names = []
+    while clickctx.parent is not None:
+        names.insert(0, clickctx.info_name)
+        clickctx = clickctx.parent
+    return names
+
+
+def group_params(clickctx):
+    """
+    Provides the parameters of all groups between the root command and the
+    command of given click context.
+    """
+    params = []
+    clickctx = clickctx.parent
+    while clickctx is not None and clickctx.parent is not None:
+        params.insert(0, clickctx.params)
+        clickctx = clickctx.parent
+    return params
+
+
+def invoke_remote(socket_path, clickctx):
+    """
+    Lets the daemon listening on *socket_path* execute the command of given
+    click context. Returns `None` if the daemon is unreachable or refuses to
+    handle the command, the caller is expected to execute the command locally
+    in that case. Otherwise the command's output is written to the local
+    streams and its exit code is returned.
+
+    Once the request was sent, the command is never executed locally: If the
+    daemon fails to respond properly, the command may have run already.
+    """
+    try:
+        request = json.dumps({
+            'conf': os.path.abspath(clickctx.find_root().obj['conf'].path),
+            'command': command_path(clickctx),
+            'groups': group_params(clickctx),
+            'params': clickctx.params,
+            'cwd': os.getcwd(),
+            'env': dict(os.environ),
+        })
+    except (TypeError, ValueError):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            log.debug('Could not reach daemon at %s: %s', socket_path, e)
+            return None
+        try:
+            sock.sendall(request.encode('utf-8') + b'\n')
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile('rb') as stream:
+                response = json.loads(stream.read().decode('utf-8'))
+            if response.get('fallback'):
+                return None
+            stdout = response['stdout']
+            stderr = response['stderr']
+            exit_code = response['exit_code']
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            click.echo('Error: Invalid response from daemon at %s: %s' % (
+                socket_path, e), err=True)
+            return 1
+    click.echo(stdout, nl=False)
+    click.echo(stderr, nl=False, err=True)
+    return exit_code
+
+
+class Daemon:
+    """
+    Serves command invocations for the already initialized *score*
+    application, that was loaded from the configuration file at *conf_path*.
+    Commands are executed one after another, each one in a fresh
+    :class:`score.ctx.Context`.
+    """
+
+    def __init__(self, score, conf_path, socket_path):
+        self.score = score
+        self.conf_path = os.path.abspath(conf_path)
+        self.socket_path = socket_path
+        self._commands = {}
+
+    def serve(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            # anyone able to connect can run commands as this user
+            umask = os.umask(0o077)
+            try:
+                server.bind(self.socket_path)
+            finally:
+                os.umask(umask)
+            os.chmod(self.socket_path, 0o600)
+            server.listen()
+            log.info('Listening on %s', self.socket_path)
+            try:
+                while True:
+                    connection, _ = server.accept()
+                    with connection:
+                        self._handle(connection)
+            finally:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.socket_path)
+
+    def _handle(self, connection):
+        try:
+            with connection.makefile('rb') as stream:
+                request = json.loads(stream.readline().decode('utf-8'))
+            response = self._execute(request)
+        except Exception:
+            log.exception('Could not handle request')
+            response = {'fallback': True}
+        with contextlib.suppress(OSError):
+            connection.sendall(json.dumps(response).encode('utf-8'))
+
+    def _find_commands(self, path):
+        """
+        Provides the root command followed by the commands along the given
+        *path*, or `None` if there is no such command.
+        """
+        key = tuple(path)
+        if key not in self._commands:
+            from score.cli.clibase import main
+            commands = [main]
+            for name in path:
+                if not hasattr(commands[-1], 'get_command'):
+                    return None
+                command = commands[-1].get_command(None, name)
+                if command is None:
+                    return None
+                commands.append(command)
+            self._commands[key] = commands
+        return self._commands[key]
+
+    def _execute(self, request):
+        global serving
+        if request['conf'] != self.conf_path:
+            return {'fallback': True}
+        commands = self._find_commands(request['command'])
+        if not commands or len(commands) < 2 or not commands[-1].callback or \
+                len(request['groups']) != len(commands) - 2:
+            return {'fallback': True}
+        from score.cli.clibase import Configuration
+        conf = Configuration(self.conf_path)
+        conf._conf = self.score
+        log.debug('Executing %s', ' '.join(request['command']))
+        stdout, stderr = io.StringIO(), io.StringIO()
+        cwd = os.getcwd()
+        environ = dict(os.environ)
+        serving = True
+        try:
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            with contextlib.redirect_stdout(stdout), \
+                    contextlib.redirect_stderr(stderr), \
+                    _redirect_log_handlers(stdout, stderr):
+                exit_code = self._invoke(commands, request, conf)
+        finally:
+            serving = False
+            os.environ.clear()
+            os.environ.update(environ)
+            os.chdir(cwd)
+        return {
+            'exit_code': exit_code,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+        }
+
+    def _invoke(self, commands, request, conf):
+        obj = {'conf': conf, 'log': logging.getLogger()}
+        # the root command's callback would load the configuration anew, so
+        # its context is populated here instead
+        clickctx = click.Context(commands[0], obj=obj)
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(clickctx)
+                all_params = request['groups'] + [request['params']]
+                for command, name, params in zip(
+                        commands[1:], request['command'], all_params):
+                    clickctx = click.Context(
+                        command, parent=clickctx, info_name=name)
+                    stack.enter_context(clickctx)
+                    if command.callback is None:
+                        continue
+                    clickctx.params = _decode_params(params)
+                    clickctx.invoke(command.callback, **clickctx.params)
+        except click.exceptions.Exit as e:
+            return e.exit_code
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            click.echo('Aborted!', err=True)
+            return 1
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            click.echo(e.code, err=True)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+
+def _decode_params(params):
+    # JSON has no tuples, but click passes variadic values as such
+    return dict(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in params.items())
+
+
+@contextlib.contextmanager
+def _redirect_log_handlers(stdout, stderr):
+    """
+    Lets all logging handlers writing to the standard streams of the daemon
+    write to the given replacements instead.
+    """
+    streams = {
+        id(sys.__stdout__): stdout,
+        id(sys.__stderr__): stderr,
+    }
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)]
+    redirected = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            if type(handler) is not logging.StreamHandler or \
+                    id(handler.stream) not in streams:
+                continue
+            original = handler.setStream(streams[id(handler.stream)])
+            redirected.append((handler, original))
+    try:
+        yield
+    finally:
+        for handler, original in redirected:
+            handler.setStream(original)
+
+
+@click.group('ctx')
+def main():
+    """
+    Commands of score.ctx
+    """
+
+
+@main.command('serve')
+@click.option('-s', '--socket', 'socket_path', envvar=SOCKET_ENV,
+              required=True, help='Path of the Unix socket to listen on.')
+@click.pass_context
+def serve(clickctx, socket_path):
+    """
+    Keeps score initialized and executes commands of other processes.
+    """
+    conf = clickctx.find_root().obj['conf']
+    Daemon(conf.load(), conf.path, socket_path).serve()
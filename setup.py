@@ -66,4 +66,9 @@ setup(
         'score.init >= 0.3.7',
         'transaction >= 3.0',
     ],
+    entry_points={
+        'score.cli': [
+            'ctx = score.ctx.daemon:main',
+        ],
+    },
 )